@@ -1,10 +1,29 @@
 #!/usr/bin/env python3
 import os
 import csv
+import gzip
+import tempfile
+import orjson
 import requests
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from dateutil.relativedelta import relativedelta
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared session so the paginated audit log calls reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
+
+# Files above this size are uploaded as parallel chunks; below it a single PUT is cheaper
+PARALLEL_UPLOAD_THRESHOLD = 32 * 1024 * 1024
 
 def convert_ms_to_iso(ms):
     """Convert milliseconds epoch to an ISO 8601 UTC datetime string."""
@@ -16,16 +35,10 @@ def convert_ms_to_iso(ms):
         return ms
 
 def fetch_jira_audit_logs():
+    """Yield Jira audit records one page at a time."""
     # Hardcoded Jira URL and endpoint
     jira_base_url = "https://prudential-ps.atlassian.net"
-    token = os.environ.get("JIRA_BASIC_TOKEN")
-    if not token:
-        raise Exception("Missing required environment variable: JIRA_BASIC_TOKEN")
     endpoint = f"{jira_base_url}/rest/api/3/auditing/record"
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"{token}"
-    }
     
     # Calculate date range for the last 7 months in ISO 8601 using timezone-aware datetime
     to_date = datetime.now(timezone.utc)
@@ -33,7 +46,6 @@ def fetch_jira_audit_logs():
     to_str = to_date.isoformat()
     from_str = from_date.isoformat()
     
-    records = []
     offset = 0
     limit = 1000
 
@@ -44,30 +56,22 @@ def fetch_jira_audit_logs():
             "offset": offset,
             "limit": limit
         }
-        response = requests.get(endpoint, headers=headers, params=params)
+        response = SESSION.get(endpoint, params=params)
         if response.status_code != 200:
             raise Exception(f"Failed to fetch Jira audit logs: {response.status_code} {response.text}")
-        data = response.json()
+        data = orjson.loads(response.content)
         # Assume records are under the 'records' key; if not, use the full response
         batch = data.get("records", data)
-        records.extend(batch)
+        yield batch
         if len(batch) < limit:
             break
         offset += limit
 
-    return records
-
 def fetch_confluence_audit_logs():
-    # Hardcoded Confluence URL and endpoint (using the same token as Jira)
+    """Yield Confluence audit records one page at a time."""
+    # Hardcoded Confluence URL and endpoint (the session carries the same token as Jira)
     confluence_base_url = "https://prudential-ps.atlassian.net/wiki"
-    token = os.environ.get("JIRA_BASIC_TOKEN")
-    if not token:
-        raise Exception("Missing required environment variable: JIRA_BASIC_TOKEN")
     endpoint = f"{confluence_base_url}/rest/api/audit"
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"{token}"
-    }
     
     # Calculate date range for the last 7 months in epoch milliseconds using timezone-aware datetime
     end_date = datetime.now(timezone.utc)
@@ -75,7 +79,6 @@ def fetch_confluence_audit_logs():
     end_epoch = int(end_date.timestamp() * 1000)
     start_epoch = int(start_date.timestamp() * 1000)
     
-    records = []
     start = 0
     limit = 1000
 
@@ -86,62 +89,92 @@ def fetch_confluence_audit_logs():
             "start": start,
             "limit": limit
         }
-        response = requests.get(endpoint, headers=headers, params=params)
+        response = SESSION.get(endpoint, params=params)
         if response.status_code != 200:
             raise Exception(f"Failed to fetch Confluence audit logs: {response.status_code} {response.text}")
-        data = response.json()
+        data = orjson.loads(response.content)
         # Assume audit records are under the 'results' key; if not, use the full response
         batch = data.get("results", data)
         # Convert the creationDate field from epoch milliseconds to ISO 8601, if present
         for record in batch:
             if "creationDate" in record:
                 record["creationDate"] = convert_ms_to_iso(record["creationDate"])
-        records.extend(batch)
+        yield batch
         if len(batch) < limit:
             break
         start += limit
 
-    return records
-
-def write_csv(records, filename):
-    if not records:
-        print(f"No records found for {filename}.")
-        return
-
-    # Compute the union of all keys across records to include every field.
+def write_csv(batches, filename):
+    """
+    Streams pages of records into a gzip-compressed CSV file.
+    Pages are spooled to a temporary file while the union of keys is collected,
+    so only one page is held in memory and no field is dropped from the header.
+    """
     all_keys = set()
-    for record in records:
-        all_keys.update(record.keys())
-    keys = sorted(all_keys)
+    with tempfile.TemporaryFile(mode="w+b") as spool:
+        for batch in batches:
+            # One C-level union per page instead of a keys() view per record
+            all_keys.update(*batch)
+            spool.writelines(orjson.dumps(record) + b"\n" for record in batch)
 
-    with open(filename, mode="w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=keys, extrasaction="ignore")
-        writer.writeheader()
-        for record in records:
-            writer.writerow(record)
+        if not all_keys:
+            print(f"No records found for {filename}.")
+            return
+
+        keys = tuple(sorted(all_keys))
+        spool.seek(0)
+        # Compress while writing; level 1 keeps the writer near plain-text speed
+        with gzip.open(filename, mode="wt", compresslevel=1, newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(keys)
+            # Build rows as plain lists and emit them in bulk rather than one DictWriter call per record
+            while True:
+                lines = list(islice(spool, 1000))
+                if not lines:
+                    break
+                records = [orjson.loads(line) for line in lines]
+                writer.writerows([[record.get(k, "") for k in keys] for record in records])
     print(f"CSV file '{filename}' created successfully.")
 
 def upload_to_gcs(filename, bucket_name, destination_blob_name):
+    # The file is already gzipped by write_csv; with Content-Encoding set GCS
+    # still serves the object decompressed to readers.
     client = storage.Client()
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
-    blob.upload_from_filename(filename)
+    blob.content_type = "text/csv"
+    blob.content_encoding = "gzip"
+    if os.path.getsize(filename) > PARALLEL_UPLOAD_THRESHOLD:
+        transfer_manager.upload_chunks_concurrently(filename, blob, chunk_size=PARALLEL_UPLOAD_THRESHOLD, max_workers=8)
+    else:
+        blob.upload_from_filename(filename)
     print(f"Uploaded {filename} to gs://{bucket_name}/{destination_blob_name}")
 
 def main():
+    # Jira and Confluence share the same token, so attach it to the session once
+    token = os.environ.get("JIRA_BASIC_TOKEN")
+    if not token:
+        raise Exception("Missing required environment variable: JIRA_BASIC_TOKEN")
+    SESSION.headers.update({
+        "Accept": "application/json",
+        "Authorization": f"{token}"
+    })
+
     today = datetime.now(timezone.utc).strftime("%Y%m%d")
     
-    # Fetch and save Jira audit logs
-    print("Fetching Jira audit logs...")
-    jira_records = fetch_jira_audit_logs()
+    # Objects keep their .csv names in GCS; the local files are the gzipped CSVs
     jira_csv_filename = f"jira_audit_{today}.csv"
-    write_csv(jira_records, jira_csv_filename)
-    
-    # Fetch and save Confluence audit logs
-    print("Fetching Confluence audit logs...")
-    confluence_records = fetch_confluence_audit_logs()
     confluence_csv_filename = f"confluence_audit_{today}.csv"
-    write_csv(confluence_records, confluence_csv_filename)
+    jira_gz_filename = f"{jira_csv_filename}.gz"
+    confluence_gz_filename = f"{confluence_csv_filename}.gz"
+
+    # Fetch and stream Jira and Confluence audit logs to CSV concurrently
+    print("Fetching Jira and Confluence audit logs...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        jira_future = executor.submit(write_csv, fetch_jira_audit_logs(), jira_gz_filename)
+        confluence_future = executor.submit(write_csv, fetch_confluence_audit_logs(), confluence_gz_filename)
+        jira_future.result()
+        confluence_future.result()
     
     # Retrieve Google Cloud Storage settings from environment variables
     bucket_name = os.environ.get("GOOGLE_CLOUD_BUCKET")
@@ -153,8 +186,8 @@ def main():
     confluence_destination = f"{folder}/{confluence_csv_filename}" if folder else confluence_csv_filename
     
     # Upload CSV files to Google Cloud Storage
-    upload_to_gcs(jira_csv_filename, bucket_name, jira_destination)
-    upload_to_gcs(confluence_csv_filename, bucket_name, confluence_destination)
+    upload_to_gcs(jira_gz_filename, bucket_name, jira_destination)
+    upload_to_gcs(confluence_gz_filename, bucket_name, confluence_destination)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
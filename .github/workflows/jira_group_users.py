@@ -1,55 +1,155 @@
+import bisect
+import functools
+import operator
 import os
+import orjson
 import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
 from fpdf import FPDF
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared session so every Jira / admin API call reuses pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
+# The admin API's users/search POST is read-only, so it is safe to retry on 429/5xx as
+# well. JSM attach/transition POSTs keep the default (no POST retries) to avoid duplicates.
+SESSION.mount("https://api.atlassian.com/", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+))
+SESSION.headers.update({"Accept": "application/json"})
+
+# Caps concurrent group/member page requests across all group fetchers so the
+# fan-out stays within the connection pool and clear of Jira's rate limits.
+GROUP_PAGE_SLOTS = threading.BoundedSemaphore(10)
+
+# accountId -> email cache persisted between workflow runs (see actions/cache in the workflow)
+EMAIL_CACHE_PATH = os.path.expanduser("~/.cache/jira_group_users/emails.json")
+EMAIL_CACHE_TTL = 24 * 60 * 60
+
+# Project groups in report order: managers, contributors (internal, external), viewers (internal, external)
+GROUP_SUFFIXES = ("MANAGERS", "CONTRIBUTORS", "EXTERNAL-CONTRIBUTORS", "VIEWERS", "EXTERNAL-VIEWERS")
+
+# Request-scoped header for JSON bodies. Content-Type is deliberately kept off the
+# session so multipart uploads still get their boundary header.
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# ----------------- Helpers for measuring text ------------------
+
+# {(family, style, size): {char: width}}. The built-in fonts have no kerning, so the
+# width of a Latin-1 string is just the sum of its character widths.
+_CHAR_WIDTHS = {}
+
+def get_char_widths(pdf):
+    """
+    Returns the width table for the current font, measuring the 256 Latin-1
+    characters once per font and reusing the table afterwards.
+    """
+    key = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+    widths = _CHAR_WIDTHS.get(key)
+    if widths is None:
+        widths = _CHAR_WIDTHS[key] = {chr(i): pdf.get_string_width(chr(i)) for i in range(256)}
+    return widths
+
+def string_width(widths, text):
+    """Measures a Latin-1 string using a width table from get_char_widths."""
+    return sum(map(widths.__getitem__, text))
 
 # ----------------- Helper for breaking long words ------------------
 def break_long_word(pdf, word, width):
     """
     Breaks a single word into parts that each fit within 'width'.
+    Cut points are found by binary search over the cumulative character widths.
     """
+    widths = get_char_widths(pdf)
+    cumulative = list(accumulate(map(widths.__getitem__, word)))
     parts = []
-    part = ""
-    for char in word:
-        if pdf.get_string_width(part + char) <= width:
-            part += char
-        else:
-            parts.append(part)
-            part = char
-    if part:
-        parts.append(part)
+    start = 0
+    while start < len(word):
+        offset = cumulative[start - 1] if start else 0
+        # Always take at least one character so a glyph wider than the cell cannot stall
+        end = max(bisect.bisect_right(cumulative, offset + width, start), start + 1)
+        parts.append(word[start:end])
+        start = end
     return parts
 
 # ----------------- Helper for text conversion ------------------
+@functools.lru_cache(maxsize=8192)
 def to_latin1(text):
     """Converts a Unicode string to Latin-1, replacing unsupported characters."""
     if not isinstance(text, str):
         text = str(text)
+    if text.isascii():
+        return text
     return text.encode("latin-1", errors="replace").decode("latin-1")
 
 # ----------------- Data Collection ------------------
 
-def get_users_in_group(jira_site, basic_auth_header, group_name):
+def get_users_in_group(jira_site, group_name):
     """
     Retrieve all users from Jira's group/member endpoint.
-    Returns a list of dicts with keys: accountId and displayName.
+    The first page reports the group's total, so the remaining pages are fetched concurrently.
+    Returns a list of dicts with keys: accountId, displayName, emailAddress (empty
+    unless the user's profile makes it visible) and sortKey (the lowercased
+    displayName used to order the PDF tables).
     """
-    start_at = 0
-    max_results = 50
-    users = []
-    while True:
-        url = f"{jira_site}/rest/api/3/group/member"
+    url = f"{jira_site}/rest/api/3/group/member"
+    max_results = 200
+
+    def fetch_page(start_at):
         params = {"groupname": group_name, "startAt": start_at, "maxResults": max_results}
-        resp = requests.get(url, headers=basic_auth_header, params=params, timeout=30)
+        with GROUP_PAGE_SLOTS:
+            resp = SESSION.get(url, params=params, timeout=30)
         resp.raise_for_status()
-        data = resp.json()
+        return orjson.loads(resp.content)
+
+    first = fetch_page(0)
+    pages = [first]
+    first_values = first.get("values", [])
+    if not first.get("isLast", True) and first_values:
+        # A full first page shows the page size the server actually honours
+        page_size = len(first_values)
+        total = first.get("total")
+        if total is not None:
+            offsets = range(page_size, total, page_size)
+            with ThreadPoolExecutor(max_workers=max(1, min(8, len(offsets)))) as executor:
+                pages.extend(executor.map(fetch_page, offsets))
+        else:
+            # No total reported; walk the remaining pages one at a time
+            start_at = page_size
+            while True:
+                data = fetch_page(start_at)
+                pages.append(data)
+                values = data.get("values", [])
+                if data.get("isLast", True) or not values:
+                    break
+                start_at += len(values)
+
+    users = []
+    for data in pages:
         for user in data.get("values", []):
+            display_name = to_latin1(user.get("displayName", ""))
             users.append({
                 "accountId": user.get("accountId"),
-                "displayName": to_latin1(user.get("displayName", ""))
+                "displayName": display_name,
+                "emailAddress": to_latin1(user.get("emailAddress") or ""),
+                "sortKey": display_name.lower()
             })
-        if data.get("isLast", True):
-            break
-        start_at += max_results
     return users
 
 def fetch_emails_in_batches(org_id, bearer_token, account_ids):
@@ -57,97 +157,220 @@ def fetch_emails_in_batches(org_id, bearer_token, account_ids):
     Retrieve emails for account IDs in batches.
     Returns a dict { accountId -> email }.
     """
+    # Nothing to look up (empty project, or every email came from cache / group/member)
+    if not account_ids:
+        return {}
+
     url = f"https://api.atlassian.com/admin/v1/orgs/{org_id}/users/search"
+    # The admin API uses its own bearer token instead of the session's Jira credentials
     headers = {"Authorization": bearer_token, "Content-Type": "application/json"}
     email_map = {}
     chunk_size = 100
-    for i in range(0, len(account_ids), chunk_size):
-        chunk = account_ids[i: i + chunk_size]
+    chunks = [account_ids[i: i + chunk_size] for i in range(0, len(account_ids), chunk_size)]
+
+    def fetch_chunk(chunk):
         payload = {"accountIds": chunk, "expand": ["EMAIL"]}
-        resp = requests.post(url, headers=headers, json=payload, timeout=30)
+        resp = SESSION.post(url, headers=headers, data=orjson.dumps(payload), timeout=30)
         resp.raise_for_status()
-        data = resp.json()
-        for entry in data.get("data", []):
+        return orjson.loads(resp.content).get("data", [])
+
+    # Chunks are independent, so post them concurrently over the pooled keep-alive
+    # connections and merge on the main thread. Most projects need only one or two
+    # chunks, so don't spin up more workers than there are requests.
+    with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as executor:
+        batches = list(executor.map(fetch_chunk, chunks))
+    for batch in batches:
+        for entry in batch:
             acct_id = entry.get("accountId")
             email = entry.get("email") or ""
             if acct_id:
                 email_map[acct_id] = to_latin1(email)
     return email_map
 
+def merge_unique_users(*user_lists):
+    """
+    Concatenates user lists, keeping only the first entry per accountId.
+    Users without an accountId are kept as-is.
+    """
+    seen = set()
+    merged = []
+    for user_list in user_lists:
+        for u in user_list:
+            acct_id = u.get("accountId")
+            if acct_id:
+                if acct_id in seen:
+                    continue
+                seen.add(acct_id)
+            merged.append(u)
+    return merged
+
+# ----------------- Email Cache ------------------
+
+def load_email_cache(path):
+    """
+    Loads the {accountId: [email, fetched_at]} cache.
+    Returns an empty dict if the file is missing or unreadable.
+    """
+    try:
+        with open(path, "rb") as f:
+            cache = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def save_email_cache(path, cache):
+    """
+    Writes the cache atomically so an interrupted run never leaves a truncated file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(cache))
+    os.replace(tmp_path, path)
+
+def fetch_emails_cached(org_id, bearer_token, account_ids, cache_path=EMAIL_CACHE_PATH, ttl=EMAIL_CACHE_TTL):
+    """
+    Resolves emails through the on-disk cache; only account IDs that are missing
+    or older than 'ttl' seconds are sent to the admin API.
+    Returns a dict { accountId -> email }.
+    """
+    cache = load_email_cache(cache_path)
+    now = time.time()
+    email_map = {}
+    stale_ids = []
+    for acct_id in account_ids:
+        entry = cache.get(acct_id)
+        if entry and now - entry[1] < ttl:
+            email_map[acct_id] = entry[0]
+        else:
+            stale_ids.append(acct_id)
+    print(f"{len(email_map)} emails served from cache, {len(stale_ids)} to fetch.")
+
+    fetched = fetch_emails_in_batches(org_id, bearer_token, stale_ids)
+    email_map.update(fetched)
+
+    # Drop expired entries so the cache doesn't grow across projects forever
+    cache = {acct_id: entry for acct_id, entry in cache.items() if now - entry[1] < ttl}
+    cache.update((acct_id, [email, now]) for acct_id, email in fetched.items())
+    save_email_cache(cache_path, cache)
+    return email_map
+
 # --------------- PDF Table Helpers (using built-in Helvetica) ------------------
 
 def get_text_lines(pdf, text, width):
     """
     Splits text into a list of lines that fit within 'width' using simple word wrap.
-    The text is first converted to Latin-1. Long words get split letter-by-letter.
+    The text must already be Latin-1 (see to_latin1). Long words get split letter-by-letter.
     """
-    text = to_latin1(text)
+    widths = get_char_widths(pdf)
+    space_width = widths[" "]
     words = text.split(' ')
     lines = []
     current_line = ""
+    current_width = 0
     for word in words:
+        word_width = string_width(widths, word)
         # If the word itself is too wide, break it up first
-        if pdf.get_string_width(word) > width:
+        if word_width > width:
             if current_line:
                 lines.append(current_line)
                 current_line = ""
+                current_width = 0
             for part in break_long_word(pdf, word, width):
                 lines.append(part)
+        elif not current_line:
+            current_line = word
+            current_width = word_width
         else:
-            test_line = word if not current_line else f"{current_line} {word}"
-            if pdf.get_string_width(test_line) > width:
+            # Grow the line width by the space and the word instead of re-measuring the line
+            test_width = current_width + space_width + word_width
+            if test_width > width:
                 lines.append(current_line)
                 current_line = word
+                current_width = word_width
             else:
-                current_line = test_line
+                current_line = f"{current_line} {word}"
+                current_width = test_width
 
     if current_line:
         lines.append(current_line)
     return lines
 
-def draw_table_row(pdf, row, col_widths, line_height):
+# {(family, style, size, width, text): lines}. Groups cells and header labels repeat
+# across rows and sections, so each distinct cell only gets wrapped once.
+_WRAPPED_LINES = {}
+
+def wrap_cell(pdf, text, width):
+    """
+    Memoized get_text_lines for the current font.
+    The returned list is shared between calls and must not be modified.
+    """
+    key = (pdf.font_family, pdf.font_style, pdf.font_size_pt, width, text)
+    lines = _WRAPPED_LINES.get(key)
+    if lines is None:
+        lines = _WRAPPED_LINES[key] = get_text_lines(pdf, text, width)
+    return lines
+
+def draw_table_rules(pdf, col_widths, row_ys):
+    """
+    Draws the borders for a block of rows on the current page: one horizontal rule
+    per row boundary in 'row_ys' and one vertical rule per column edge.
+    """
+    if len(row_ys) < 2:
+        return
+    x_edges = list(accumulate(col_widths, initial=pdf.l_margin))
+    top, bottom = row_ys[0], row_ys[-1]
+    for y in row_ys:
+        pdf.line(x_edges[0], y, x_edges[-1], y)
+    for x in x_edges:
+        pdf.line(x, top, x, bottom)
+
+def draw_table_row(pdf, row, col_widths, wrap_widths, line_height, row_ys):
     """
     Draws a table row with wrapped text.
+    'wrap_widths' are the usable text widths of the columns (column width minus padding).
     All cells are padded so they share the same height.
-    If the row won't fit on the current page, a new page is added.
+    Borders are not drawn here: the row's bottom edge is appended to 'row_ys' and the
+    caller draws the whole grid with draw_table_rules once the table is done.
+    If the row won't fit on the current page, the rows so far are ruled and a new page is added.
     """
-    cell_line_counts = [len(get_text_lines(pdf, cell, w - 2)) for cell, w in zip(row, col_widths)]
-    max_lines = max(cell_line_counts) if cell_line_counts else 1
+    # Wrap each cell once; the same lines size the row and are drawn below
+    cell_lines = [wrap_cell(pdf, cell, w) for cell, w in zip(row, wrap_widths)]
+    max_lines = max(map(len, cell_lines)) if cell_lines else 1
     row_height = max_lines * line_height
 
     if pdf.get_y() + row_height > pdf.page_break_trigger:
+        # Rules can only be drawn on the current page, so close off this page's block first
+        draw_table_rules(pdf, col_widths, row_ys)
         pdf.add_page()
+        row_ys[:] = [pdf.get_y()]
 
     x_start = pdf.get_x()
     y_start = pdf.get_y()
 
-    for i, cell in enumerate(row):
-        x = pdf.get_x()
-        cell_lines = get_text_lines(pdf, cell, col_widths[i] - 2)
-        padded_lines = cell_lines + [""] * (max_lines - len(cell_lines))
-        cell_text = "\n".join(padded_lines)
-        pdf.multi_cell(col_widths[i], line_height, cell_text, border=0)
-        pdf.set_xy(x + col_widths[i], y_start)
-
     x = x_start
-    for w in col_widths:
-        pdf.rect(x, y_start, w, row_height)
+    for lines, w in zip(cell_lines, col_widths):
+        padded_lines = lines + [""] * (max_lines - len(lines))
+        pdf.multi_cell(w, line_height, "\n".join(padded_lines), border=0)
         x += w
+        pdf.set_xy(x, y_start)
     pdf.set_xy(x_start, y_start + row_height)
+    row_ys.append(y_start + row_height)
 
-def draw_table_header(pdf, headers, col_widths, line_height):
+def draw_table_header(pdf, headers, col_widths, wrap_widths, line_height, row_ys):
     """
     Draws the table header row in bold.
     """
     pdf.set_font("Helvetica", "B", 10)
-    draw_table_row(pdf, headers, col_widths, line_height)
+    draw_table_row(pdf, headers, col_widths, wrap_widths, line_height, row_ys)
     pdf.set_font("Helvetica", "", 10)
 
-def generate_pdf_with_wrapping_tables(pdf_filename, managers, contributors, viewers, user_groups):
+def generate_pdf_with_wrapping_tables(managers, contributors, viewers, user_groups):
     """
     Creates a PDF with sections for Managers, Contributors, and Viewers formatted as tables.
     Each table has columns: Name, Email, Groups.
     Uses the built-in Helvetica font with text converted to Latin-1.
+    Returns the PDF as bytes; nothing is written to disk.
     """
     pdf = FPDF()
     pdf.add_page()
@@ -155,67 +378,75 @@ def generate_pdf_with_wrapping_tables(pdf_filename, managers, contributors, view
     pdf.set_font("Helvetica", "", 10)
 
     col_widths = [45, 55, 90]
+    # Leave 2mm of padding inside each cell border
+    wrap_widths = [w - 2 for w in col_widths]
     line_height = 6
 
+    # Users appear in up to three sections, so build each Groups cell once
+    group_strs = {acct_id: to_latin1(", ".join(sorted(groups))) for acct_id, groups in user_groups.items()}
+
     def section_table(title, users):
         pdf.set_font("Helvetica", "B", 12)
         pdf.cell(0, 10, to_latin1(title), ln=True)
         pdf.set_font("Helvetica", "", 10)
         header = ["Name", "Email", "Groups"]
-        draw_table_header(pdf, header, col_widths, line_height)
-        for u in sorted(users, key=lambda u: u.get("displayName", "").lower()):
+        # Row boundaries of the table's block on the current page
+        row_ys = [pdf.get_y()]
+        draw_table_header(pdf, header, col_widths, wrap_widths, line_height, row_ys)
+        for u in sorted(users, key=operator.itemgetter("sortKey")):
             name = u.get("displayName", "")
             acct_id = u.get("accountId", "")
             email = u.get("emailAddress", acct_id)
-            groups = ", ".join(sorted(user_groups.get(acct_id, [])))
-            draw_table_row(pdf, [name, email, groups], col_widths, line_height)
+            groups = group_strs.get(acct_id, "")
+            draw_table_row(pdf, [name, email, groups], col_widths, wrap_widths, line_height, row_ys)
+        draw_table_rules(pdf, col_widths, row_ys)
         pdf.ln(3)
 
     section_table("Managers", managers)
     section_table("Contributors", contributors)
     section_table("Viewers", viewers)
-    pdf.output(pdf_filename)
-    print(f"Generated PDF: {pdf_filename}")
+    # fpdf 1.7 returns the document as a Latin-1 str
+    pdf_bytes = pdf.output(dest="S").encode("latin-1")
+    print(f"Generated PDF ({len(pdf_bytes)} bytes)")
+    return pdf_bytes
 
 
 # ----------------- Service Desk Attachment ------------------
 
-def upload_temp_file_jsm(jira_site, basic_auth, service_desk_id, pdf_filename):
+def upload_temp_file_jsm(jira_site, service_desk_id, pdf_filename, pdf_bytes):
     """
-    Uploads the file as a temporary attachment to the given service desk ID.
+    Uploads the PDF bytes as a temporary attachment named 'pdf_filename' to the given service desk ID.
     Returns a list of temporaryAttachmentId strings.
     """
     url = f"{jira_site}/rest/servicedeskapi/servicedesk/{service_desk_id}/attachTemporaryFile"
-    headers = {"Authorization": basic_auth, "X-Atlassian-Token": "no-check", "Accept": "application/json"}
-    with open(pdf_filename, "rb") as f:
-        files = {"file": (pdf_filename, f, "application/pdf")}
-        resp = requests.post(url, headers=headers, files=files, timeout=30)
+    headers = {"X-Atlassian-Token": "no-check"}
+    files = {"file": (pdf_filename, pdf_bytes, "application/pdf")}
+    resp = SESSION.post(url, headers=headers, files=files, timeout=30)
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content)
     temp_ids = [item["temporaryAttachmentId"] for item in data.get("temporaryAttachments", [])]
     print(f"Uploaded '{pdf_filename}' as temporary attachment(s): {temp_ids}")
     return temp_ids
 
 
-def attach_temp_file_to_request(jira_site, basic_auth, issue_key, temp_attachment_ids, comment_text, public=True):
+def attach_temp_file_to_request(jira_site, issue_key, temp_attachment_ids, comment_text, public=True):
     """
     Permanently attaches the temporary file(s) to a JSM request and adds a comment.
     """
     url = f"{jira_site}/rest/servicedeskapi/request/{issue_key}/attachment"
-    headers = {"Authorization": basic_auth, "Content-Type": "application/json", "Accept": "application/json"}
     payload = {
         "additionalComment": {"body": to_latin1(comment_text)},
         "public": public,
         "temporaryAttachmentIds": temp_attachment_ids
     }
-    resp = requests.post(url, headers=headers, json=payload, timeout=30)
+    resp = SESSION.post(url, headers=JSON_HEADERS, data=orjson.dumps(payload), timeout=30)
     resp.raise_for_status()
     print(f"Successfully attached PDF and added comment to {issue_key}.")
 
 
 # ----------------- Issue Transition ------------------
 
-def transition_issue_to_done(jira_site, basic_auth, issue_key, transition_id="121"):
+def transition_issue_to_done(jira_site, issue_key, transition_id="121"):
     """
     Transitions the issue using the provided transition ID and sets Resolution to "Done".
     Sends payload:
@@ -226,8 +457,7 @@ def transition_issue_to_done(jira_site, basic_auth, issue_key, transition_id="12
     """
     url = f"{jira_site}/rest/api/3/issue/{issue_key}/transitions"
     payload = {"transition": {"id": transition_id}, "fields": {"resolution": {"name": "Done"}}}
-    headers = {"Authorization": basic_auth, "Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, json=payload, timeout=30)
+    resp = SESSION.post(url, headers=JSON_HEADERS, data=orjson.dumps(payload), timeout=30)
     try:
         resp.raise_for_status()
     except requests.HTTPError as error:
@@ -247,59 +477,73 @@ def main():
     org_id = os.environ.get("ORG_ID", "b4235a52-bd04-12a0-j718-68bd06255171")
     service_desk_id = 6
 
-    if not all([jira_site, basic_auth, bearer_token, project_key, issue_key, org_id]):
-        raise ValueError("Missing one or more required env vars: JIRA_SITE, BASIC_AUTH, BEARER_TOKEN, PROJECT_KEY, ISSUE_KEY, ORG_ID")
+    required = {
+        "JIRA_SITE": jira_site,
+        "BASIC_AUTH": basic_auth,
+        "BEARER_TOKEN": bearer_token,
+        "PROJECT_KEY": project_key,
+        "ISSUE_KEY": issue_key,
+        "ORG_ID": org_id,
+    }
+    missing = [name for name, value in required.items() if not value]
+    if missing:
+        raise ValueError(f"Missing required env vars: {', '.join(missing)}")
     
-    jira_headers = {"Authorization": basic_auth, "Content-Type": "application/json"}
-
-    group_managers = f"ATLASSIAN-{project_key}-MANAGERS"
-    group_contrib = f"ATLASSIAN-{project_key}-CONTRIBUTORS"
-    group_extern = f"ATLASSIAN-{project_key}-EXTERNAL-CONTRIBUTORS"
-    group_view = f"ATLASSIAN-{project_key}-VIEWERS"
-    group_view_ext = f"ATLASSIAN-{project_key}-EXTERNAL-VIEWERS"
-
-    managers = get_users_in_group(jira_site, jira_headers, group_managers)
-    contrib = get_users_in_group(jira_site, jira_headers, group_contrib)
-    extern = get_users_in_group(jira_site, jira_headers, group_extern)
-    view = get_users_in_group(jira_site, jira_headers, group_view)
-    view_ext = get_users_in_group(jira_site, jira_headers, group_view_ext)
-
-    all_contributors = contrib + extern
-    all_viewers = view + view_ext
-
+    # Jira credentials are attached once to the shared session
+    SESSION.headers.update({"Authorization": basic_auth})
+
+    # The five group pagers are independent, so run them concurrently on the shared session
+    group_names = [f"ATLASSIAN-{project_key}-{suffix}" for suffix in GROUP_SUFFIXES]
+    with ThreadPoolExecutor(max_workers=len(group_names)) as executor:
+        results = list(executor.map(lambda g: get_users_in_group(jira_site, g), group_names))
+    managers, contrib, extern, view, view_ext = results
+
+    # Someone in both the internal and external group of a role gets one row per section;
+    # the Groups column already lists both memberships.
+    all_contributors = merge_unique_users(contrib, extern)
+    all_viewers = merge_unique_users(view, view_ext)
+
+    # One pass over the (group, members) pairs builds both the accountId -> groups map
+    # and an accountId -> user dicts index; a user in several groups has one dict per group.
     user_groups = {}
-    def add_group(user_list, group_name):
+    users_by_id = {}
+    for group_name, user_list in zip(group_names, results):
         for u in user_list:
             acct_id = u.get("accountId")
-            if acct_id:
-                user_groups.setdefault(acct_id, set()).add(group_name)
-    add_group(managers, group_managers)
-    add_group(contrib, group_contrib)
-    add_group(extern, group_extern)
-    add_group(view, group_view)
-    add_group(view_ext, group_view_ext)
-
-    unique_ids = {u["accountId"] for u in (managers + all_contributors + all_viewers) if u.get("accountId")}
-    print(f"Found {len(unique_ids)} unique accountIds.")
-    account_ids = list(unique_ids)
-    email_map = fetch_emails_in_batches(org_id, bearer_token, account_ids)
-    def attach_email(user_list):
+            if not acct_id:
+                continue
+            same_user = users_by_id.get(acct_id)
+            if same_user is None:
+                users_by_id[acct_id] = [u]
+                user_groups[acct_id] = {group_name}
+            else:
+                same_user.append(u)
+                user_groups[acct_id].add(group_name)
+    # group/member already carries emailAddress for users with a visible email;
+    # only the rest need a lookup through the admin API.
+    email_map = {}
+    missing_ids = []
+    for acct_id, user_list in users_by_id.items():
+        email = user_list[0]["emailAddress"]
+        if email:
+            email_map[acct_id] = email
+        else:
+            missing_ids.append(acct_id)
+    print(f"Found {len(users_by_id)} unique accountIds, {len(missing_ids)} without a visible email.")
+    email_map.update(fetch_emails_cached(org_id, bearer_token, missing_ids))
+    for acct_id, user_list in users_by_id.items():
+        email = email_map.get(acct_id, "")
         for u in user_list:
-            acct_id = u.get("accountId")
-            if acct_id:
-                u["emailAddress"] = to_latin1(email_map.get(acct_id, ""))
-    attach_email(managers)
-    attach_email(all_contributors)
-    attach_email(all_viewers)
+            u["emailAddress"] = email
 
     pdf_filename = f"{project_key}-UserList.pdf"
-    generate_pdf_with_wrapping_tables(pdf_filename, managers, all_contributors, all_viewers, user_groups)
+    pdf_bytes = generate_pdf_with_wrapping_tables(managers, all_contributors, all_viewers, user_groups)
 
-    temp_ids = upload_temp_file_jsm(jira_site, basic_auth, service_desk_id, pdf_filename)
+    temp_ids = upload_temp_file_jsm(jira_site, service_desk_id, pdf_filename, pdf_bytes)
     comment_text = "The current Project Members have been attached."
-    attach_temp_file_to_request(jira_site, basic_auth, issue_key, temp_ids, comment_text, public=True)
+    attach_temp_file_to_request(jira_site, issue_key, temp_ids, comment_text, public=True)
 
-    transition_issue_to_done(jira_site, basic_auth, issue_key, transition_id="121")
+    transition_issue_to_done(jira_site, issue_key, transition_id="121")
 
     print(f"Done. PDF '{pdf_filename}' attached to {issue_key} and the issue transitioned to Done with Resolution set.")
 
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
 import os
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- CONFIGURATION ---
 JIRA_BASE_URL = os.environ.get("JIRA_BASE_URL")
@@ -17,22 +20,46 @@ TARGET_EMAIL = os.environ.get("TARGET_EMAIL", "default@example.com")
 ORG_ID = "ffd0f976-d0a5-418f-8ca5-a1d67cadc185"
 RESTORE_ACCESS_URL_TEMPLATE = "https://api.atlassian.com/admin/v1/orgs/{org_id}/directory/users/{account_id}/restore-access"
 
+# Shared session so the user search pages reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
+# The Jira user search headers are sent with every call; restore_access overrides Authorization
+SESSION.headers.update({
+    "Authorization": f"Basic {BASIC_TOKEN}",
+    "Accept": "application/json",
+    "User-Agent": "test-agent",
+    "X-Atlassian-Token": "nocheck"
+})
+
+def search_account_id():
+    # user/search matches on email directly, so a visible email resolves in one request
+    url = f"{JIRA_BASE_URL}/rest/api/3/user/search"
+    response = SESSION.get(url, params={"query": TARGET_EMAIL, "maxResults": 10})
+    response.raise_for_status()
+    for user in orjson.loads(response.content):
+        if user.get("emailAddress", "").lower() == TARGET_EMAIL.lower():
+            return user.get("accountId", "")
+    return None
+
 def fetch_account_id():
-    headers = {
-        "Authorization": f"Basic {BASIC_TOKEN}",
-        "Accept": "application/json",
-        "User-Agent": "test-agent",
-        "X-Atlassian-Token": "nocheck"
-    }
+    found_account_id = search_account_id()
+    if found_account_id:
+        return found_account_id
+
+    # Fall back to walking the whole directory
     start_at = 0
-    max_results = 50
-    found_account_id = None
+    # Largest page users/search serves; fewer round trips when walking the directory
+    max_results = 200
 
     while True:
         url = f"{JIRA_BASE_URL}/rest/api/3/users/search?startAt={start_at}&maxResults={max_results}"
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(url)
         response.raise_for_status()
-        users = response.json()
+        users = orjson.loads(response.content)
         if not users:
             break
         for user in users:
@@ -42,16 +69,14 @@ def fetch_account_id():
                 break
         if found_account_id:
             break
-        start_at += max_results
+        # Advance by what was actually returned in case the server caps the page size
+        start_at += len(users)
     return found_account_id
 
 def restore_access(account_id):
     url = RESTORE_ACCESS_URL_TEMPLATE.format(org_id=ORG_ID, account_id=account_id)
-    headers = {
-        "Authorization": f"Bearer {BEARER_TOKEN}",
-        "Accept": "application/json"
-    }
-    response = requests.post(url, headers=headers)  # POST with empty body
+    headers = {"Authorization": f"Bearer {BEARER_TOKEN}"}
+    response = SESSION.post(url, headers=headers)  # POST with empty body
     return response
 
 def main():